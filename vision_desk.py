@@ -1,10 +1,110 @@
 import sys
+import time
+import threading
 import cv2
 import numpy as np
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QLabel, QSlider, 
-                             QCheckBox, QPushButton, QVBoxLayout, QHBoxLayout, QGroupBox)
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QImage, QPixmap
+                             QCheckBox, QPushButton, QVBoxLayout, QHBoxLayout, QGroupBox,
+                             QComboBox, QOpenGLWidget)
+from PyQt5.QtCore import (Qt, QEvent, QTimer, QElapsedTimer, QRect, QObject, QRunnable,
+                          QThreadPool, pyqtSignal)
+from PyQt5.QtGui import QImage, QPainter, QTransform
+
+
+def camera_backend():
+    """Pick the lowest-latency capture backend for the current platform"""
+    if sys.platform.startswith('win'):
+        return cv2.CAP_DSHOW
+    if sys.platform == 'darwin':
+        return cv2.CAP_AVFOUNDATION
+    return cv2.CAP_V4L2
+
+
+def open_camera(index=0):
+    """Open a camera with a single-frame driver buffer so reads are never stale"""
+    camera = cv2.VideoCapture(index, camera_backend())
+    if not camera.isOpened():
+        # Fall back to whatever backend OpenCV picks by default
+        camera = cv2.VideoCapture(index)
+    
+    # Ask for MJPG to avoid a software YUYV decode at higher resolutions
+    camera.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    # Keep only the newest frame queued in the driver
+    camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return camera
+
+
+class CameraThread(threading.Thread):
+    """Background thread that keeps only the most recent camera frame"""
+    
+    # Seconds without a take_frame() call before frames stop being decoded
+    idle_timeout = 0.5
+    
+    def __init__(self, camera):
+        super().__init__(daemon=True)
+        self.camera = camera
+        self.lock = threading.Lock()
+        self.frame = None
+        self.last_take = time.perf_counter()
+        self.running = True
+    
+    def run(self):
+        while self.running:
+            # grab() dequeues the next frame without decoding it, which keeps
+            # the driver buffer drained
+            if not self.camera.grab():
+                print("Error: Failed to capture image")
+                time.sleep(0.03)
+                continue
+            
+            # Skip the decode while nobody is taking frames (window
+            # minimized or hidden), and drop the last decoded frame so it
+            # is not shown once frames are taken again
+            if time.perf_counter() - self.last_take > self.idle_timeout:
+                if self.frame is not None:
+                    with self.lock:
+                        self.frame = None
+                continue
+            
+            ret, frame = self.camera.retrieve()
+            if not ret:
+                continue
+            
+            # Overwrite the slot so the GUI always sees the freshest frame
+            with self.lock:
+                self.frame = frame
+    
+    def take_frame(self):
+        # Hand the latest frame to the caller and empty the slot, so the
+        # same frame is never processed twice
+        with self.lock:
+            frame, self.frame = self.frame, None
+            self.last_take = time.perf_counter()
+        return frame
+    
+    def stop(self):
+        self.running = False
+        self.join()
+
+
+class FrameSignals(QObject):
+    """Signals emitted by FrameJob, delivered on the GUI thread"""
+    
+    finished = pyqtSignal(object)
+
+
+class FrameJob(QRunnable):
+    """Runs process_frame for one frame on a QThreadPool worker"""
+    
+    def __init__(self, process, frame, roi):
+        super().__init__()
+        self.process = process
+        self.frame = frame
+        self.roi = roi
+        self.signals = FrameSignals()
+    
+    def run(self):
+        self.signals.finished.emit(self.process(self.frame, self.roi))
 
 
 class ROISelector:
@@ -14,29 +114,30 @@ class ROISelector:
         self.selecting = False
         self.selected = False
         self.start_point = (0, 0)
-        self.end_point = (0, 0)
+        # Sorted rectangle corners as [x1, y1, x2, y2], kept up to date on
+        # every mouse update so drawing needs no min/max
+        self.corners = np.zeros(4, dtype=np.int32)
         self.roi = None
     
     def start_selection(self, x, y):
         self.selecting = True
         self.selected = False
         self.start_point = (x, y)
-        self.end_point = (x, y)
+        self.corners[:] = (x, y, x, y)
     
     def update_selection(self, x, y):
         if self.selecting:
-            self.end_point = (x, y)
+            # Ensure the corners are top-left and bottom-right
+            start_x, start_y = self.start_point
+            self.corners[:] = (min(start_x, x), min(start_y, y), max(start_x, x), max(start_y, y))
     
     def finish_selection(self):
         if self.selecting:
             self.selecting = False
             self.selected = True
             
-            # Ensure start_point is top-left and end_point is bottom-right
-            x1, y1 = min(self.start_point[0], self.end_point[0]), min(self.start_point[1], self.end_point[1])
-            x2, y2 = max(self.start_point[0], self.end_point[0]), max(self.start_point[1], self.end_point[1])
-            
-            self.roi = (x1, y1, x2, y2)
+            # Store an immutable copy for the processing thread
+            self.roi = tuple(self.corners.tolist())
     
     def clear_selection(self):
         self.selecting = False
@@ -50,63 +151,94 @@ class ROISelector:
     
     def draw_roi(self, frame):
         if self.selecting or self.selected:
-            x1 = min(self.start_point[0], self.end_point[0])
-            y1 = min(self.start_point[1], self.end_point[1])
-            x2 = max(self.start_point[0], self.end_point[0])
-            y2 = max(self.start_point[1], self.end_point[1])
-            
+            x1, y1, x2, y2 = self.corners.tolist()
             cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
         return frame
 
 
-class VideoWidget(QLabel):
+class VideoWidget(QOpenGLWidget):
     """Custom widget to display and interact with camera feed"""
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setAlignment(Qt.AlignCenter)
         self.roi_selector = ROISelector()
         self.setMouseTracking(True)
-        self.setStyleSheet("border: 1px solid gray")
         self.setMinimumSize(640, 480)
+        
+        # Latest frame and the QImage wrapping its buffer
+        self.frame = None
+        self.image = None
+        # Area of the widget the frame is drawn into, keeping aspect ratio
+        self.target_rect = QRect()
+    
+    def set_frame(self, frame):
+        """Show a BGR frame; scaling happens on the GPU when painting"""
+        h, w = frame.shape[:2]
+        resized = self.image is None or self.image.width() != w or self.image.height() != h
+        
+        # Keep a reference to the array, QImage does not copy its buffer.
+        # Format_BGR888 (Qt 5.14+) reads OpenCV's channel order directly
+        self.frame = frame
+        self.image = QImage(frame.data, w, h, frame.strides[0], QImage.Format_BGR888)
+        if resized:
+            self.update_target_rect()
+        self.update()
+    
+    def update_target_rect(self):
+        if self.image is None:
+            return
+        size = self.image.size().scaled(self.size(), Qt.KeepAspectRatio)
+        self.target_rect = QRect(0, 0, size.width(), size.height())
+        self.target_rect.moveCenter(self.rect().center())
+        
+        # Cache the widget-to-image transform for the mouse handlers
+        self.image_w = self.image.width()
+        self.image_h = self.image.height()
+        self.offset_x = self.target_rect.x()
+        self.offset_y = self.target_rect.y()
+        self.scale_x = self.image_w / max(1, self.target_rect.width())
+        self.scale_y = self.image_h / max(1, self.target_rect.height())
+    
+    def resizeGL(self, w, h):
+        self.update_target_rect()
+    
+    def paintGL(self):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.black)
+        if self.image is not None:
+            # Let the GL paint engine do the filtered scale as a textured quad,
+            # mirrored about the widget center for a more natural view
+            painter.save()
+            painter.setTransform(QTransform(-1, 0, 0, 1, self.width(), 0))
+            painter.setRenderHint(QPainter.SmoothPixmapTransform)
+            painter.drawImage(self.target_rect, self.image)
+            painter.restore()
+        painter.setPen(Qt.gray)
+        painter.drawRect(self.rect().adjusted(0, 0, -1, -1))
+        painter.end()
+    
+    def to_image_coords(self, pos):
+        """Convert widget coordinates to image coordinates"""
+        if self.image is None:
+            return None
+        
+        # The image is painted mirrored, and coordinates are kept inside it
+        img_x = self.image_w - 1 - int((pos.x() - self.offset_x) * self.scale_x)
+        img_x = max(0, min(img_x, self.image_w - 1))
+        img_y = max(0, min(int((pos.y() - self.offset_y) * self.scale_y), self.image_h - 1))
+        return img_x, img_y
     
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
-            pos = event.pos()
-            # Convert position from Qt coordinates to image coordinates
-            img_size = self.pixmap().size() if self.pixmap() else None
-            if img_size:
-                # Scale factor between widget size and pixmap size
-                scale_x = self.width() / img_size.width()
-                scale_y = self.height() / img_size.height()
-                
-                # Widget coordinates
-                pos_x, pos_y = pos.x(), pos.y()
-                
-                # Convert to image coordinates
-                img_x = int(pos_x / scale_x)
-                img_y = int(pos_y / scale_y)
-                
-                self.roi_selector.start_selection(img_x, img_y)
+            img_coords = self.to_image_coords(event.pos())
+            if img_coords:
+                self.roi_selector.start_selection(*img_coords)
     
     def mouseMoveEvent(self, event):
         if self.roi_selector.selecting:
-            pos = event.pos()
-            # Convert position from Qt coordinates to image coordinates
-            img_size = self.pixmap().size() if self.pixmap() else None
-            if img_size:
-                # Scale factor between widget size and pixmap size
-                scale_x = self.width() / img_size.width()
-                scale_y = self.height() / img_size.height()
-                
-                # Widget coordinates
-                pos_x, pos_y = pos.x(), pos.y()
-                
-                # Convert to image coordinates
-                img_x = int(pos_x / scale_x)
-                img_y = int(pos_y / scale_y)
-                
-                self.roi_selector.update_selection(img_x, img_y)
+            img_coords = self.to_image_coords(event.pos())
+            if img_coords:
+                self.roi_selector.update_selection(*img_coords)
     
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.LeftButton:
@@ -121,20 +253,48 @@ class VisionDesk(QMainWindow):
         self.initUI()
         
         # Initialize camera
-        self.camera = cv2.VideoCapture(0)
+        self.camera = open_camera(0)
         if not self.camera.isOpened():
             print("Error: Could not open camera.")
             sys.exit(1)
         
-        # Set up timer for updating the camera feed
+        # Read the camera on its own thread so the GUI never blocks on I/O
+        self.camera_thread = CameraThread(self.camera)
+        self.camera_thread.start()
+        
+        # Set up a single-shot timer for updating the camera feed. Each tick
+        # reschedules itself after its own work, so a slow frame delays the
+        # next one instead of queueing timer events
+        self.frame_interval = 33  # Target ~30 fps
+        self.frame_clock = QElapsedTimer()
+        self.running = True
         self.timer = QTimer()
-        self.timer.timeout.connect(self.update_frame)
-        self.timer.start(30)  # Update every 30ms (~33 fps)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.tick)
+        self.timer.start(0)
         
         # Initialize variables
         self.use_canny = False
         self.low_threshold = 50
         self.high_threshold = 150
+        self.canny_scale = 1
+        self.last_roi = None
+        
+        # Process frames on a single worker thread, one frame in flight
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(1)
+        self.processing = False
+        
+        # Preallocated per-frame buffers, keyed by name
+        self.buffers = {}
+        
+        # Run the Canny blur and edge detection on the GPU when OpenCV was
+        # built with CUDA and a device is present
+        self.use_cuda = hasattr(cv2, 'cuda') and cv2.cuda.getCudaEnabledDeviceCount() > 0
+        if self.use_cuda:
+            self.gpu_gray = cv2.cuda_GpuMat()
+            self.gaussian_gpu = cv2.cuda.createGaussianFilter(cv2.CV_8UC1, cv2.CV_8UC1, (5, 5), 1.4)
+            self.canny_gpu = cv2.cuda.createCannyEdgeDetector(self.low_threshold, self.high_threshold)
     
     def initUI(self):
         # Set up the main window
@@ -167,7 +327,7 @@ class VisionDesk(QMainWindow):
         low_threshold_layout = QHBoxLayout()
         low_threshold_layout.addWidget(QLabel("Low Threshold:"))
         self.low_threshold_slider = QSlider(Qt.Horizontal)
-        self.low_threshold_slider.setRange(0, 255)
+        self.low_threshold_slider.setRange(0, 254)
         self.low_threshold_slider.setValue(50)
         self.low_threshold_slider.valueChanged.connect(self.update_low_threshold)
         self.low_threshold_label = QLabel("50")
@@ -178,7 +338,7 @@ class VisionDesk(QMainWindow):
         high_threshold_layout = QHBoxLayout()
         high_threshold_layout.addWidget(QLabel("High Threshold:"))
         self.high_threshold_slider = QSlider(Qt.Horizontal)
-        self.high_threshold_slider.setRange(0, 255)
+        self.high_threshold_slider.setRange(1, 255)
         self.high_threshold_slider.setValue(150)
         self.high_threshold_slider.valueChanged.connect(self.update_high_threshold)
         self.high_threshold_label = QLabel("150")
@@ -188,6 +348,15 @@ class VisionDesk(QMainWindow):
         
         threshold_group.setLayout(threshold_layout)
         canny_layout.addWidget(threshold_group)
+        
+        # Add processing scale selector
+        scale_layout = QHBoxLayout()
+        scale_layout.addWidget(QLabel("Processing Scale:"))
+        self.canny_scale_combo = QComboBox()
+        self.canny_scale_combo.addItems(["Full", "1/2", "1/4"])
+        self.canny_scale_combo.currentIndexChanged.connect(self.change_canny_scale)
+        scale_layout.addWidget(self.canny_scale_combo)
+        canny_layout.addLayout(scale_layout)
         canny_group.setLayout(canny_layout)
         control_panel_layout.addWidget(canny_group)
         
@@ -223,89 +392,189 @@ class VisionDesk(QMainWindow):
     def toggle_canny(self, checked):
         self.use_canny = checked
     
+    def change_canny_scale(self, index):
+        # Combo index 0, 1, 2 maps to a downscale factor of 1, 2, 4
+        self.canny_scale = 2 ** index
+    
     def update_low_threshold(self, value):
         self.low_threshold = value
         self.low_threshold_label.setText(str(value))
+        
+        # Keep high above low so Canny's hysteresis stays well defined
+        if self.high_threshold <= value:
+            self.high_threshold_slider.setValue(value + 1)
     
     def update_high_threshold(self, value):
         self.high_threshold = value
         self.high_threshold_label.setText(str(value))
+        
+        # Keep low below high so Canny's hysteresis stays well defined
+        if self.low_threshold >= value:
+            self.low_threshold_slider.setValue(value - 1)
     
     def clear_roi(self):
         self.video_widget.roi_selector.clear_selection()
         self.roi_info_label.setText("No ROI selected")
+        self.last_roi = None
+    
+    def tick(self):
+        self.frame_clock.start()
+        self.update_frame()
+        
+        # Wait only for what is left of the frame interval. While minimized
+        # the chain stops and changeEvent restarts it
+        if self.running and not self.isMinimized():
+            self.timer.start(max(0, self.frame_interval - self.frame_clock.elapsed()))
+    
+    def changeEvent(self, event):
+        # Resume the frame loop when the window is restored. The grabber
+        # thread keeps draining the camera meanwhile and drops its stale
+        # frame, so the first frame shown is decoded after the restore
+        if event.type() == QEvent.WindowStateChange and hasattr(self, 'timer'):
+            if self.isMinimized():
+                self.timer.stop()
+            elif self.running and not self.timer.isActive():
+                self.timer.start(0)
+        super().changeEvent(event)
     
     def update_frame(self):
-        ret, frame = self.camera.read()
-        if not ret:
-            print("Error: Failed to capture image")
+        # Nothing to show while the window is hidden
+        if not self.isVisible():
             return
         
-        # Flip the frame horizontally for a more natural view
-        frame = cv2.flip(frame, 1)
-        
-        # Process frame based on current settings
-        processed_frame = self.process_frame(frame.copy())
+        # Skip this tick while the previous frame is still being processed;
+        # the grabber keeps only the newest frame in the meantime
+        if self.processing:
+            return
         
-        # Draw ROI if it exists
-        processed_frame = self.video_widget.roi_selector.draw_roi(processed_frame)
+        frame = self.camera_thread.take_frame()
+        if frame is None:
+            return
         
-        # Update ROI info label
+        # Update ROI info label, only when the ROI has changed
         roi = self.video_widget.roi_selector.get_roi()
-        if roi:
+        if roi and roi != self.last_roi:
+            self.last_roi = roi
             x1, y1, x2, y2 = roi
-            self.roi_info_label.setText(f"ROI: ({x1}, {y1}) to ({x2}, {y2})")
+            # The ROI is kept in frame coordinates, but the frame is shown
+            # mirrored, so report x as it appears on screen
+            w = frame.shape[1]
+            self.roi_info_label.setText(f"ROI: ({w - 1 - x2}, {y1}) to ({w - 1 - x1}, {y2})")
         
-        # Convert the frame to Qt format and display it
-        self.display_frame(processed_frame)
+        # Process frame based on current settings on the worker thread. The
+        # frame is owned by this job, so it can be modified in place. The ROI
+        # tuple is passed as a snapshot so the mouse handlers can keep
+        # changing the selection meanwhile
+        self.processing = True
+        job = FrameJob(self.process_frame, frame, roi)
+        job.signals.finished.connect(self.show_processed_frame)
+        self.pool.start(job)
     
-    def process_frame(self, frame):
-        # Get ROI if available
-        roi = self.video_widget.roi_selector.get_roi()
+    def show_processed_frame(self, frame):
+        self.processing = False
         
+        # Convert the frame to Qt format and display it. The frame is
+        # mirrored for a more natural view by the video widget when painting
+        self.display_frame(frame)
+    
+    def process_frame(self, frame, roi):
         if self.use_canny:
-            # Convert frame to grayscale for Canny edge detection
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            
             if roi:
-                # Extract ROI
+                # Extract ROI and convert only that tile to grayscale
                 x1, y1, x2, y2 = roi
-                roi_gray = gray[y1:y2, x1:x2]
+                roi_frame = frame[y1:y2, x1:x2]
+                roi_gray = cv2.cvtColor(roi_frame, cv2.COLOR_BGR2GRAY,
+                                        dst=self.get_buffer('roi_gray', roi_frame.shape[:2]))
                 
                 # Apply Canny edge detection to ROI
-                edges_roi = cv2.Canny(roi_gray, self.low_threshold, self.high_threshold)
-                
-                # Convert edges back to BGR for display
-                edges_roi_bgr = cv2.cvtColor(edges_roi, cv2.COLOR_GRAY2BGR)
+                edges_roi = self.canny(roi_gray, 'roi_')
                 
-                # Replace the ROI area in the original frame
-                frame[y1:y2, x1:x2] = edges_roi_bgr
+                # Replace the ROI area in the original frame, broadcasting
+                # the edges to all three channels
+                roi_frame[...] = edges_roi[..., np.newaxis]
             else:
-                # Apply Canny edge detection to the entire frame
-                edges = cv2.Canny(gray, self.low_threshold, self.high_threshold)
-                frame = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
+                # Convert frame to grayscale for Canny edge detection
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY,
+                                    dst=self.get_buffer('gray', frame.shape[:2]))
+                
+                # Apply Canny edge detection to the entire frame, writing the
+                # result over the frame itself; a shared buffer could be
+                # overwritten by the next job while this one is on screen
+                edges = self.canny(gray)
+                frame = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR, dst=frame)
         
         return frame
     
-    def display_frame(self, frame):
-        # Convert frame from BGR to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    def canny(self, gray, prefix=''):
+        # Run Canny on a pyramid level of the input; the work drops with the
+        # square of canny_scale and the display scales the result anyway
+        small = gray
+        scale = self.canny_scale
+        level = 0
+        while scale > 1:
+            level += 1
+            h, w = small.shape
+            small = cv2.pyrDown(small, dst=self.get_buffer(f'{prefix}pyr{level}', ((h + 1) // 2, (w + 1) // 2)))
+            scale //= 2
         
-        # Convert to QImage
-        h, w, ch = rgb_frame.shape
-        bytesPerLine = ch * w
-        qImg = QImage(rgb_frame.data, w, h, bytesPerLine, QImage.Format_RGB888)
+        if self.use_cuda:
+            edges = self.canny_cuda(small, prefix)
+        else:
+            edges = self.canny_cpu(small, prefix)
+        if small is gray:
+            return edges
         
-        # Scale the QImage to fit the video widget
-        scaled_pixmap = QPixmap.fromImage(qImg).scaled(
-            self.video_widget.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation
-        )
+        # Upsample back to the input size; nearest-neighbour keeps edges binary
+        h, w = gray.shape
+        return cv2.resize(edges, (w, h), dst=self.get_buffer(prefix + 'edges_full', gray.shape),
+                          interpolation=cv2.INTER_NEAREST)
+    
+    def canny_cpu(self, gray, prefix=''):
+        # Smooth sensor noise before Canny so weak-edge tracing stays bounded
+        blurred = cv2.GaussianBlur(gray, (5, 5), 1.4,
+                                   dst=self.get_buffer(prefix + 'blur', gray.shape))
+        return cv2.Canny(blurred, self.low_threshold, self.high_threshold,
+                         self.get_buffer(prefix + 'edges', gray.shape))
+    
+    def canny_cuda(self, gray, prefix=''):
+        # Upload once, blur and detect on the device, download into the
+        # preallocated edges buffer
+        self.gpu_gray.upload(gray)
+        blurred = self.gaussian_gpu.apply(self.gpu_gray)
+        self.canny_gpu.setLowThreshold(self.low_threshold)
+        self.canny_gpu.setHighThreshold(self.high_threshold)
+        edges = self.canny_gpu.detect(blurred)
+        return edges.download(self.get_buffer(prefix + 'edges', gray.shape))
+    
+    def get_buffer(self, name, shape):
+        # Reuse a preallocated buffer while its shape is unchanged
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, np.uint8)
+            self.buffers[name] = buffer
+        return buffer
+    
+    def display_frame(self, frame):
+        # Draw ROI if it exists
+        frame = self.video_widget.roi_selector.draw_roi(frame)
         
-        # Display the image
-        self.video_widget.setPixmap(scaled_pixmap)
+        # Hand the full-resolution BGR frame to the GL widget, which wraps
+        # it without conversion and scales and mirrors it on the GPU
+        self.video_widget.set_frame(frame)
     
     def closeEvent(self, event):
-        # Release the camera when closing the application
+        # Break the frame timer chain
+        self.running = False
+        if hasattr(self, 'timer'):
+            self.timer.stop()
+        
+        # Let the frame in flight finish before tearing down
+        if hasattr(self, 'pool'):
+            self.pool.waitForDone()
+        
+        # Stop the grabber thread before releasing the camera it reads from
+        if hasattr(self, 'camera_thread'):
+            self.camera_thread.stop()
         if hasattr(self, 'camera'):
             self.camera.release()
         event.accept()
@@ -1,15 +1,182 @@
 import sys
 import os
+# Keep OpenMP from spawning a full thread team per small per-frame operator;
+# this has to be set before cv2 is imported
+os.environ.setdefault('OMP_NUM_THREADS', '1')
 import cv2
 import numpy as np
 import time
+import threading
+import queue
+import glob
+import re
+import shutil
+import subprocess
+import tempfile
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
+from fractions import Fraction
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QLabel, QSlider, 
                              QCheckBox, QPushButton, QVBoxLayout, QHBoxLayout, QGroupBox,
                              QComboBox, QFileDialog, QMessageBox, QTabWidget, QStatusBar,
-                             QSpinBox, QStyle, QSplitter, QLCDNumber)
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QSize
-from PyQt5.QtGui import QImage, QPixmap, QIcon, QFont, QPalette, QColor
+                             QSpinBox, QStyle, QSplitter, QLCDNumber, QOpenGLWidget)
+from PyQt5.QtCore import (Qt, QTimer, pyqtSignal, QSize, QObject, QThread, QRect,
+                          QRunnable, QThreadPool)
+from PyQt5.QtGui import QImage, QIcon, QFont, QPalette, QColor, QPainter
+
+try:
+    import av  # Optional: PyAV, used for NVENC hardware encoding
+except ImportError:
+    av = None
+
+try:
+    import numba  # Optional: compiles the fused Sketch kernel
+except ImportError:
+    numba = None
+
+
+if numba is not None:
+    @numba.njit('void(uint8[:, ::1], uint8[:, ::1], uint8[:, ::1])',
+                parallel=True, fastmath=True, cache=True)
+    def sketch_kernel(gray, blurred, out):
+        """Divide gray by the inverted blur in a single pass"""
+        for i in numba.prange(gray.shape[0]):
+            for j in range(gray.shape[1]):
+                # Same result as cv2.divide(gray, 255 - blurred, scale=256),
+                # written branch-free in float32 so the loop vectorizes
+                inv = np.float32(255 - np.int32(blurred[i, j]))
+                value = np.float32(gray[i, j]) * np.float32(256.0) / max(inv, np.float32(0.5))
+                value = min(value + np.float32(0.5), np.float32(255.0))
+                out[i, j] = np.uint8(value if inv > 0 else np.float32(0.0))
+else:
+    sketch_kernel = None
+
+
+# Hardware H.264 encoders to try with the ffmpeg command line tool, with the
+# extra arguments each needs before and after the raw video input
+FFMPEG_ENCODERS = {
+    'h264_videotoolbox': ([], ['-c:v', 'h264_videotoolbox', '-realtime', '1', '-pix_fmt', 'yuv420p']),
+    'h264_nvenc': ([], ['-c:v', 'h264_nvenc', '-preset', 'p1', '-tune', 'ull', '-rc', 'cbr',
+                        '-pix_fmt', 'yuv420p']),
+    'h264_qsv': ([], ['-c:v', 'h264_qsv', '-preset', 'veryfast', '-pix_fmt', 'nv12']),
+    'h264_vaapi': (['-vaapi_device', '/dev/dri/renderD128'],
+                   ['-vf', 'format=nv12,hwupload', '-c:v', 'h264_vaapi']),
+}
+
+
+def camera_backend():
+    """Pick the capture backend that delivers frames with the least conversion"""
+    if sys.platform.startswith('win'):
+        return cv2.CAP_DSHOW
+    if sys.platform == 'darwin':
+        return cv2.CAP_AVFOUNDATION
+    return cv2.CAP_V4L2
+
+
+def camera_candidates():
+    """List the camera indices worth probing"""
+    if sys.platform.startswith('linux'):
+        # Only probe the V4L2 device nodes that exist
+        nodes = glob.glob('/dev/video*')
+        return sorted(int(m.group(1)) for m in map(re.compile(r'/dev/video(\d+)$').match, nodes) if m)
+    # Check indices 0-9, which are enough for most systems
+    return list(range(10))
+
+
+# Seconds camera detection waits for the probes before giving up on the rest
+CAMERA_PROBE_TIMEOUT = 5.0
+
+
+def probe_camera(index):
+    """Return the index if a camera can be opened there, otherwise None"""
+    cap = cv2.VideoCapture(index, camera_backend())
+    try:
+        return index if cap.isOpened() else None
+    finally:
+        cap.release()
+
+
+def cuda_available():
+    """Check whether OpenCV was built with CUDA and a GPU is present"""
+    try:
+        return cv2.cuda.getCudaEnabledDeviceCount() > 0
+    except (AttributeError, cv2.error):
+        return False
+
+
+# Quantized YuNet face detector from the OpenCV model zoo; the Haar cascade is
+# used when the model file is not present
+YUNET_MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'models', 'face_detection_yunet_2023mar_int8.onnx')
+
+
+def create_face_detector():
+    """Load the YuNet face detector, or return None if it is not available"""
+    if not os.path.exists(YUNET_MODEL) or not hasattr(cv2, 'FaceDetectorYN'):
+        return None
+    # The int8 model only runs on the OpenCV CPU backend
+    return cv2.FaceDetectorYN.create(YUNET_MODEL, "", (320, 240), 0.8, 0.3, 5000,
+                                     cv2.dnn.DNN_BACKEND_OPENCV, cv2.dnn.DNN_TARGET_CPU)
+
+
+# Settings a frame is processed with. They are snapshotted on the GUI thread
+# for each FrameJob, so the processing and face detection threads never read
+# widgets or settings the GUI thread is changing
+ProcessingSettings = namedtuple('ProcessingSettings', [
+    'filter_name', 'use_canny', 'low_threshold', 'high_threshold', 'canny_scale', 'blur_size',
+    'use_opencl', 'detect_faces', 'face_min_size', 'face_scale_factor'])
+
+
+class FrameSignals(QObject):
+    """Signals emitted by FrameJob, delivered on the GUI thread"""
+    
+    finished = pyqtSignal(object)
+
+
+class FrameJob(QRunnable):
+    """Runs process_frame for one frame on a QThreadPool worker"""
+    
+    def __init__(self, process, frame, roi, settings):
+        super().__init__()
+        self.process = process
+        self.frame = frame
+        self.roi = roi
+        self.settings = settings
+        self.signals = FrameSignals()
+    
+    def run(self):
+        self.signals.finished.emit(self.process(self.frame, self.roi, self.settings))
+
+
+class FaceJob(QRunnable):
+    """Runs face detection on a downscaled frame on a QThreadPool worker"""
+    
+    def __init__(self, detect, frame, scale, region, settings):
+        super().__init__()
+        self.detect = detect
+        self.frame = frame
+        self.scale = scale
+        # ROI the frame was cut from, None for the full frame
+        self.region = region
+        self.settings = settings
+        self.signals = FrameSignals()
+    
+    def run(self):
+        self.signals.finished.emit((self.region, self.detect(self.frame, self.scale, self.settings)))
+
+
+class SnapshotJob(QRunnable):
+    """Encodes and writes a snapshot on a QThreadPool worker"""
+    
+    def __init__(self, filename, frame):
+        super().__init__()
+        self.filename = filename
+        self.frame = frame
+        self.signals = FrameSignals()
+    
+    def run(self):
+        self.signals.finished.emit((self.filename, cv2.imwrite(self.filename, self.frame)))
 
 
 class ROISelector:
@@ -21,25 +188,60 @@ class ROISelector:
         self.start_point = (0, 0)
         self.end_point = (0, 0)
         self.roi = None
+        
+        # Sorted corners and dimension text, cached by update_corners()
+        self.top_left = (0, 0)
+        self.bottom_right = (0, 0)
+        self.text_pos = (0, 0)
+        self.dim_text = None
+        # Dimension text rasterized once per size, and the mask of its pixels
+        self.text_img = None
+        self.text_mask = None
+        self.text_offset = (0, 0)
     
     def start_selection(self, x, y):
         self.selecting = True
         self.selected = False
         self.start_point = (x, y)
         self.end_point = (x, y)
+        self.update_corners()
     
     def update_selection(self, x, y):
         if self.selecting:
             self.end_point = (x, y)
+            self.update_corners()
+    
+    def update_corners(self):
+        """Cache the corners and dimension text drawn by draw_roi"""
+        # Ensure top_left is top-left and bottom_right is bottom-right
+        x1, y1 = min(self.start_point[0], self.end_point[0]), min(self.start_point[1], self.end_point[1])
+        x2, y2 = max(self.start_point[0], self.end_point[0]), max(self.start_point[1], self.end_point[1])
+        self.top_left = (x1, y1)
+        self.bottom_right = (x2, y2)
+        
+        dim_text = f"{x2-x1}x{y2-y1}"
+        if dim_text != self.dim_text:
+            self.dim_text = dim_text
+            self.render_text()
+        self.text_pos = (x1 + self.text_offset[0], y1 - 5 + self.text_offset[1])
+    
+    def render_text(self):
+        """Rasterize the dimension text into a small overlay image"""
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        (w, h), baseline = cv2.getTextSize(self.dim_text, font, 0.5, 1)
+        pad = 2
+        self.text_img = np.zeros((h + baseline + 2 * pad, w + 2 * pad, 3), np.uint8)
+        cv2.putText(self.text_img, self.dim_text, (pad, pad + h), font, 0.5, (0, 255, 0), 1)
+        self.text_mask = np.ascontiguousarray(self.text_img[:, :, 1])
+        # Position of the overlay relative to the text baseline origin
+        self.text_offset = (-pad, -pad - h)
     
     def finish_selection(self):
         if self.selecting:
             self.selecting = False
             self.selected = True
-            
-            # Ensure start_point is top-left and end_point is bottom-right
-            x1, y1 = min(self.start_point[0], self.end_point[0]), min(self.start_point[1], self.end_point[1])
-            x2, y2 = max(self.start_point[0], self.end_point[0]), max(self.start_point[1], self.end_point[1])
+            x1, y1 = self.top_left
+            x2, y2 = self.bottom_right
             
             # Ensure minimum size of ROI
             if x2 - x1 < 10 or y2 - y1 < 10:
@@ -61,16 +263,17 @@ class ROISelector:
     
     def draw_roi(self, frame):
         if self.selecting or self.selected:
-            x1 = min(self.start_point[0], self.end_point[0])
-            y1 = min(self.start_point[1], self.end_point[1])
-            x2 = max(self.start_point[0], self.end_point[0])
-            y2 = max(self.start_point[1], self.end_point[1])
+            cv2.rectangle(frame, self.top_left, self.bottom_right, (0, 255, 0), 2)
             
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            
-            # Draw dimensions text
-            text = f"{x2-x1}x{y2-y1}"
-            cv2.putText(frame, text, (x1, y1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+            # Copy the pre-rendered dimensions text in, clipped to the frame
+            x, y = self.text_pos
+            th, tw = self.text_img.shape[:2]
+            fx1, fy1 = max(x, 0), max(y, 0)
+            fx2, fy2 = min(x + tw, frame.shape[1]), min(y + th, frame.shape[0])
+            if fx1 < fx2 and fy1 < fy2:
+                sx, sy = fx1 - x, fy1 - y
+                src = (slice(sy, sy + fy2 - fy1), slice(sx, sx + fx2 - fx1))
+                cv2.copyTo(self.text_img[src], self.text_mask[src], frame[fy1:fy2, fx1:fx2])
         return frame
 
 
@@ -79,65 +282,382 @@ class VideoRecorder:
     
     def __init__(self, fps=30.0):
         self.output = None
+        self.container = None
+        self.stream = None
         self.is_recording = False
         self.fps = fps
         self.filename = None
         self.start_time = None
         self.frame_size = None
+        self.timestamp = None
+        self.segment = 0
+        
+        # Frames are encoded on a writer thread; a full queue drops frames
+        # rather than stalling the GUI thread
+        self.frames = None
+        self.writer = None
+        # Message of an encoder error that ended the recording early
+        self.error = None
+        
+        # Prefer a hardware encoder through the ffmpeg tool, then NVENC
+        # through PyAV, and otherwise fall back to OpenCV's XVID writer.
+        # Probing runs test encodes that can take seconds, so it runs in the
+        # background from the start; backend is the one used while recording
+        self.backend = None
+        self.best_backend = None
+        self.codec = None
+        self.process = None
+        # ffmpeg's error output, kept to report why an encode failed
+        self.ffmpeg_log = None
+        threading.Thread(target=self.probe_backend, daemon=True).start()
+    
+    def probe_backend(self):
+        """Pick the fastest encoder that works on this machine"""
+        self.codec = self.probe_ffmpeg()
+        if self.codec:
+            self.best_backend = 'ffmpeg'
+        elif self.probe_nvenc():
+            self.best_backend = 'av'
+        else:
+            self.best_backend = 'opencv'
+    
+    @staticmethod
+    def probe_ffmpeg():
+        """Return the first hardware encoder the ffmpeg tool can actually use"""
+        if shutil.which('ffmpeg') is None:
+            return None
+        
+        try:
+            encoders = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'], capture_output=True,
+                                      text=True, timeout=10).stdout
+        except (OSError, subprocess.SubprocessError):
+            return None
+        
+        for codec, (input_args, output_args) in FFMPEG_ENCODERS.items():
+            if codec not in encoders:
+                continue
+            # A listed encoder may still have no device behind it, so
+            # encode a few test frames
+            command = ['ffmpeg', '-hide_banner', '-loglevel', 'error', *input_args,
+                       '-f', 'lavfi', '-i', 'color=size=256x256:rate=30:duration=0.1',
+                       *output_args, '-f', 'null', '-']
+            try:
+                if subprocess.run(command, capture_output=True, timeout=10).returncode == 0:
+                    return codec
+            except (OSError, subprocess.SubprocessError):
+                pass
+        return None
+    
+    @staticmethod
+    def probe_nvenc():
+        """Check whether the h264_nvenc encoder can actually be opened"""
+        if av is None:
+            return False
+        
+        try:
+            context = av.CodecContext.create('h264_nvenc', 'w')
+            context.width = 256
+            context.height = 256
+            context.pix_fmt = 'yuv420p'
+            context.time_base = Fraction(1, 30)
+            context.open()
+            context.close()
+        except Exception:
+            # Unknown codec, or FFmpeg could not reach an NVENC device
+            return False
+        return True
     
-    def start_recording(self, frame_size):
+    def start_recording(self):
         if self.is_recording:
             return
+        
+        # A writer left behind by stop_recording still owns the encoder
+        # fields, so no new recording starts until it has finished
+        if self.writer is not None:
+            if self.writer.is_alive():
+                self.error = "The previous recording is still being written"
+                return None
+            self.writer = None
             
         # Create output directory if it doesn't exist
         os.makedirs('recordings', exist_ok=True)
         
-        # Generate unique filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.filename = f"recordings/visiondesk_{timestamp}.avi"
-        
-        # Initialize VideoWriter
-        fourcc = cv2.VideoWriter_fourcc(*'XVID')
-        self.output = cv2.VideoWriter(self.filename, fourcc, self.fps, frame_size)
-        self.frame_size = frame_size
+        # A recording started before probing is done uses OpenCV rather
+        # than wait for it
+        self.backend = self.best_backend or 'opencv'
+        
+        # Generate unique filename with timestamp. The encoder is created on
+        # the first frame, which fixes the frame size for the file
+        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.segment = 0
+        self.filename = self.segment_filename()
+        self.error = None
+        self.frames = queue.Queue(maxsize=8)
         self.is_recording = True
-        self.start_time = time.time()
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+        self.start_time = time.perf_counter()
         return self.filename
     
+    def segment_filename(self):
+        """Filename for the current segment of the recording"""
+        extension = "avi" if self.backend == 'opencv' else "mp4"
+        suffix = f"_{self.segment}" if self.segment else ""
+        return f"recordings/visiondesk_{self.timestamp}{suffix}.{extension}"
+    
+    def open_output(self, frame_size):
+        """Create the encoder for frames of the given size"""
+        if self.backend == 'ffmpeg':
+            # Pipe raw BGR frames into ffmpeg, which encodes on the GPU in
+            # its own process
+            input_args, output_args = FFMPEG_ENCODERS[self.codec]
+            width, height = frame_size
+            command = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error', *input_args,
+                       '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f"{width}x{height}",
+                       '-r', str(self.fps), '-i', '-', *output_args, self.filename]
+            self.ffmpeg_log = tempfile.TemporaryFile()
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                            stdout=subprocess.DEVNULL, stderr=self.ffmpeg_log)
+        elif self.backend == 'av':
+            # Encode H.264 on the GPU with low-latency, constant-bitrate settings
+            self.container = av.open(self.filename, 'w')
+            self.stream = self.container.add_stream('h264_nvenc', rate=Fraction(self.fps).limit_denominator(1000))
+            self.stream.width, self.stream.height = frame_size
+            self.stream.pix_fmt = 'yuv420p'
+            self.stream.options = {'preset': 'p4', 'tune': 'll', 'rc': 'cbr'}
+        else:
+            # Initialize VideoWriter
+            fourcc = cv2.VideoWriter_fourcc(*'XVID')
+            self.output = cv2.VideoWriter(self.filename, fourcc, self.fps, frame_size)
+        self.frame_size = frame_size
+    
+    def close_output(self):
+        """Flush and close the current encoder, raising if ffmpeg failed"""
+        error = None
+        if self.process is not None:
+            # Closing stdin lets ffmpeg flush and finish the file
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            if self.process.returncode != 0:
+                error = self.ffmpeg_failure()
+            self.ffmpeg_log.close()
+            self.ffmpeg_log = None
+            self.process = None
+        elif self.stream is not None:
+            # Flush frames still buffered in the encoder
+            for packet in self.stream.encode(None):
+                self.container.mux(packet)
+            self.container.close()
+            self.container = None
+            self.stream = None
+        elif self.output:
+            self.output.release()
+            self.output = None
+        self.frame_size = None
+        if error:
+            raise RuntimeError(error)
+    
+    def ffmpeg_failure(self):
+        """Describe an ffmpeg failure with the last lines of its error output"""
+        self.ffmpeg_log.seek(0)
+        lines = self.ffmpeg_log.read().decode(errors='replace').strip().splitlines()
+        reason = "; ".join(lines[-3:]) if lines else "no error output"
+        return f"ffmpeg exited with code {self.process.returncode}: {reason}"
+    
     def write_frame(self, frame):
-        if self.is_recording and self.output and frame is not None:
-            # Ensure frame size matches what was specified
-            h, w = frame.shape[:2]
-            if (w, h) != self.frame_size:
-                frame = cv2.resize(frame, self.frame_size)
+        """Queue a frame for the writer thread"""
+        if not self.is_recording or frame is None:
+            return
+        
+        try:
+            self.frames.put_nowait(frame)
+        except queue.Full:
+            pass
+    
+    def write_loop(self):
+        """Encode queued frames until stop_recording() sends None, then close the file"""
+        while True:
+            try:
+                frame = self.frames.get(timeout=0.5)
+            except queue.Empty:
+                # stop_recording could not queue None while the queue was
+                # full; stop once it has been drained
+                if self.is_recording:
+                    continue
+                break
+            if frame is None:
+                break
+            if self.error is not None:
+                # Keep draining the queue, so write_frame and stop_recording
+                # never wait on a writer that stopped encoding
+                continue
+            try:
+                self.encode_frame(frame)
+            except Exception as e:
+                # An encoder failure, e.g. in the hardware encoder, ends the
+                # recording but not the thread
+                self.error = str(e)
+        
+        # The file is closed on this thread, so it is never closed under an
+        # encoder call that is still running
+        try:
+            self.close_output()
+        except Exception as e:
+            if self.error is None:
+                self.error = str(e)
+    
+    def encode_frame(self, frame):
+        # The frame size is fixed per file. A resolution change starts a new
+        # file instead of resizing every frame to the old size
+        h, w = frame.shape[:2]
+        if (w, h) != self.frame_size:
+            if self.frame_size is not None:
+                self.close_output()
+                self.segment += 1
+                self.filename = self.segment_filename()
+            self.open_output((w, h))
+        
+        if self.process is not None:
+            try:
+                self.process.stdin.write(np.ascontiguousarray(frame).data)
+            except (OSError, ValueError):
+                # ffmpeg exited early. Closing it raises with its error
+                # output; the frames written so far are kept
+                self.close_output()
+                raise RuntimeError("ffmpeg stopped accepting frames")
+        elif self.stream is not None:
+            video_frame = av.VideoFrame.from_ndarray(frame, format='bgr24')
+            for packet in self.stream.encode(video_frame):
+                self.container.mux(packet)
+        else:
             self.output.write(frame)
     
     def stop_recording(self):
-        if self.is_recording and self.output:
-            self.output.release()
-            self.is_recording = False
-            return self.filename
-        return None
+        if not self.is_recording:
+            return None
+        
+        # Let the writer finish the queued frames and close the file. If the
+        # queue stays full, the writer stops by itself once it is drained
+        self.is_recording = False
+        if self.writer.is_alive():
+            try:
+                self.frames.put(None, timeout=2)
+            except queue.Full:
+                pass
+            self.writer.join(timeout=10)
+        
+        # A writer stuck in an encoder call is left to close the file when
+        # it returns, and keeps the encoder fields until then
+        if self.writer.is_alive():
+            if self.error is None:
+                self.error = "The encoder did not finish, the file may be incomplete"
+        else:
+            self.writer = None
+        return self.filename
     
     def get_recording_time(self):
         if self.is_recording and self.start_time:
-            return int(time.time() - self.start_time)
+            return int(time.perf_counter() - self.start_time)
         return 0
 
 
-class VideoWidget(QLabel):
+class CaptureWorker(QObject):
+    """Worker that reads camera frames on its own QThread"""
+    
+    frame_ready = pyqtSignal()
+    capture_failed = pyqtSignal()
+    
+    def __init__(self, camera, fps_limit=30):
+        super().__init__()
+        self.camera = camera
+        # Backlogged frames fall off the end instead of queueing up
+        self.frames = deque(maxlen=2)
+        # At most one frame_ready signal is queued at a time, so a slow
+        # update_frame never has a pile of stale notifications to work through
+        self.lock = threading.Lock()
+        self.notified = False
+        # Set here rather than in run(), so a stop() that lands before the
+        # thread starts running is not overwritten
+        self.running = True
+        self.min_interval = 1.0 / fps_limit
+        self.next_emit = 0.0
+    
+    def run(self):
+        """Capture loop, runs until stop() is called"""
+        while self.running:
+            ret, frame = self.camera.read()
+            if not ret:
+                self.capture_failed.emit()
+                time.sleep(0.1)
+                continue
+            
+            # Keep reading at the camera rate so the driver buffer never
+            # goes stale, but only hand frames over at the FPS limit. A
+            # quarter interval of slack keeps camera jitter from dropping
+            # frames when the camera runs at the limit itself
+            now = time.perf_counter()
+            if now < self.next_emit - self.min_interval * 0.25:
+                continue
+            
+            # Advance the deadline by whole intervals rather than restarting
+            # it from now, so the average rate matches the limit even when
+            # the camera rate is not a multiple of it. After falling behind,
+            # e.g. with a camera slower than the limit, start over from now
+            self.next_emit += self.min_interval
+            if self.next_emit < now:
+                self.next_emit = now + self.min_interval
+            
+            with self.lock:
+                self.frames.append(frame)
+                notify = not self.notified
+                self.notified = True
+            if notify:
+                self.frame_ready.emit()
+    
+    def stop(self):
+        self.running = False
+    
+    def set_fps_limit(self, fps):
+        self.min_interval = 1.0 / fps
+    
+    def latest_frame(self):
+        """Return the newest captured frame, dropping any older ones"""
+        with self.lock:
+            self.notified = False
+            frame = self.frames[-1] if self.frames else None
+            self.frames.clear()
+        return frame
+
+
+class VideoWidget(QOpenGLWidget):
     """Custom widget to display and interact with camera feed"""
     
     roi_selected = pyqtSignal()
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setAlignment(Qt.AlignCenter)
         self.roi_selector = ROISelector()
         self.setMouseTracking(True)
-        self.setStyleSheet("border: 1px solid #444; background-color: #222;")
         self.setMinimumSize(640, 480)
         self.drag_start_pos = None
+        
+        # Latest frame and the QImage wrapping its buffer
+        self.frame = None
+        self.image = None
+        # Area of the widget the frame is drawn into, keeping aspect ratio
+        self.target_rect = QRect()
+        
+        # Coordinate mapping, cached by update_mapping()
+        self.img_w = self.img_h = 0
+        self.scale_x = self.scale_y = 1.0
+        self.offset_x = self.offset_y = 0.0
     
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
@@ -165,30 +685,65 @@ class VideoWidget(QLabel):
                 self.roi_selected.emit()
             self.drag_start_pos = None
     
+    def set_frame(self, frame):
+        """Show a BGR frame; it is uploaded and scaled on the GPU when painting"""
+        h, w = frame.shape[:2]
+        
+        # Keep a reference to the array, QImage does not copy its buffer
+        self.frame = np.ascontiguousarray(frame)
+        self.image = QImage(self.frame.data, w, h, self.frame.strides[0], QImage.Format_BGR888)
+        
+        # Only a size change affects the coordinate mapping
+        if w != self.img_w or h != self.img_h:
+            self.update_mapping()
+        self.update()
+    
+    def resizeGL(self, w, h):
+        self.update_mapping()
+    
+    def update_mapping(self):
+        """Cache the letterbox rectangle and the scaling used by widget_to_image_coords"""
+        if self.image is None:
+            self.img_w = self.img_h = 0
+            return
+        
+        # Fit the frame into the widget, keeping its aspect ratio
+        size = self.image.size().scaled(self.size(), Qt.KeepAspectRatio)
+        self.target_rect = QRect(0, 0, size.width(), size.height())
+        self.target_rect.moveCenter(self.rect().center())
+        
+        # Calculate scaling factors and the offset of the centered image
+        self.img_w = self.image.width()
+        self.img_h = self.image.height()
+        self.scale_x = self.img_w / max(1, self.target_rect.width())
+        self.scale_y = self.img_h / max(1, self.target_rect.height())
+        self.offset_x = self.target_rect.x()
+        self.offset_y = self.target_rect.y()
+    
+    def paintGL(self):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#222"))
+        if self.image is not None:
+            # The GL paint engine uploads the image as a texture and draws
+            # the scaled quad on the GPU
+            painter.setRenderHint(QPainter.SmoothPixmapTransform)
+            painter.drawImage(self.target_rect, self.image)
+        painter.setPen(QColor("#444"))
+        painter.drawRect(self.rect().adjusted(0, 0, -1, -1))
+        painter.end()
+    
     def widget_to_image_coords(self, widget_x, widget_y):
         """Convert widget coordinates to image coordinates"""
-        if not self.pixmap() or self.pixmap().isNull():
+        if not self.img_w:
             return None
-            
-        # Get the scaled dimensions
-        img_rect = self.pixmap().rect()
-        scaled_rect = self.rect()
-        
-        # Calculate scaling factors
-        scale_x = img_rect.width() / scaled_rect.width()
-        scale_y = img_rect.height() / scaled_rect.height()
-        
-        # Calculate offset if image is centered in the widget
-        offset_x = (scaled_rect.width() - img_rect.width() / scale_x) / 2
-        offset_y = (scaled_rect.height() - img_rect.height() / scale_y) / 2
         
         # Adjust coordinates
-        img_x = int((widget_x - offset_x) * scale_x)
-        img_y = int((widget_y - offset_y) * scale_y)
+        img_x = int((widget_x - self.offset_x) * self.scale_x)
+        img_y = int((widget_y - self.offset_y) * self.scale_y)
         
         # Ensure coordinates are within image bounds
-        img_x = max(0, min(img_x, img_rect.width() - 1))
-        img_y = max(0, min(img_y, img_rect.height() - 1))
+        img_x = max(0, min(img_x, self.img_w - 1))
+        img_y = max(0, min(img_y, self.img_h - 1))
         
         return img_x, img_y
 
@@ -196,23 +751,25 @@ class VideoWidget(QLabel):
 class FPSCounter:
     """Class to calculate and display frames per second"""
     
-    def __init__(self, update_interval=1.0):
+    def __init__(self, update_interval=0.5):
         self.frame_count = 0
         self.fps = 0
-        self.last_update_time = time.time()
+        self.last_update_time = time.perf_counter()
         self.update_interval = update_interval
     
     def update(self):
+        """Count a frame; return the FPS and whether it was recalculated"""
         self.frame_count += 1
-        current_time = time.time()
+        current_time = time.perf_counter()
         elapsed = current_time - self.last_update_time
         
         if elapsed > self.update_interval:
             self.fps = self.frame_count / elapsed
             self.frame_count = 0
             self.last_update_time = current_time
+            return self.fps, True
             
-        return self.fps
+        return self.fps, False
 
 
 class VisionDesk(QMainWindow):
@@ -222,6 +779,13 @@ class VisionDesk(QMainWindow):
         super().__init__()
         self.setWindowTitle('VisionDesk | Advanced Computer Vision')
         
+        # A few OpenCV threads are enough for camera-sized frames; more only
+        # add synchronization overhead. Two cores are left for the capture
+        # and GUI threads, so the filters do not compete with them
+        cv2.setUseOptimized(True)
+        self.cv_threads = max(1, min(4, (os.cpu_count() or 1) - 2))
+        cv2.setNumThreads(self.cv_threads)
+        
         # Set app icon
         app_icon = self.style().standardIcon(QStyle.SP_ComputerIcon)
         self.setWindowIcon(app_icon)
@@ -232,18 +796,84 @@ class VisionDesk(QMainWindow):
         # Initialize UI components
         self.initUI()
         
-        # Initialize camera
+        # Initialize camera; frames are read by a CaptureWorker on its own
+        # thread and delivered to update_frame through frame_ready
         self.camera = None
         self.camera_index = 0
+        self.capture_thread = None
+        self.capture_worker = None
         self.open_camera()
         
         # Initialize variables
         self.use_canny = False
         self.low_threshold = 50
         self.high_threshold = 150
+        self.canny_scale = 1
         self.current_filter = "None"
+        
+        # Canny, Gaussian blur and the Cartoon bilateral filter run on the GPU
+        # when OpenCV has CUDA, and a blurred frame stays there for Canny; frames
+        # below cuda_min_pixels stay on the CPU, where the upload and download
+        # would cost more than the filter itself
+        self.use_cuda = cuda_available()
+        self.cuda_min_pixels = 640 * 480
+        if self.use_cuda:
+            self.gpu_frame = cv2.cuda_GpuMat()
+            self.gpu_gray = cv2.cuda_GpuMat()
+            self.gpu_bgra = cv2.cuda_GpuMat()
+            # One detector for the session; the thresholds are set on it for
+            # each frame, so the GUI thread never has to replace it
+            self.gpu_canny = cv2.cuda.createCannyEdgeDetector(self.low_threshold, self.high_threshold)
+        self.gpu_blurs = {}
+        
+        # Process frames on a single worker thread, one frame in flight, so
+        # capture, processing and encoding each run on their own thread
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(1)
+        self.processing = False
+        
+        # Preallocated filter buffers, reused while the frame size is unchanged
+        self.scratch = {}
+        
+        # Filter on the GPU through OpenCL, if available and enabled. The
+        # setting is applied on the processing thread, see process_frame()
+        self.use_opencl = self.opencl_checkbox.isChecked()
+        
+        # Sepia filter matrix
+        self.sepia_kernel = np.array([
+            [0.272, 0.534, 0.131],
+            [0.349, 0.686, 0.168],
+            [0.393, 0.769, 0.189]
+        ], dtype=np.float32)
+        self.sharp_kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]], dtype=np.float32)
+        self.emboss_kernel = np.array([[-2,-1,0], [-1,1,1], [0,1,2]], dtype=np.float32)
+        
+        # Filters by name, looked up once per frame. Those in gray_filters
+        # return a single grayscale channel
+        self.filters = {
+            "Sepia": self.sepia_filter,
+            "Blur": self.blur_filter,
+            "Sharp": self.sharp_filter,
+            "Invert": self.invert_filter,
+            "Cartoon": self.cartoon_filter,
+            "Emboss": self.emboss_filter,
+        }
+        self.gray_filters = {
+            "Grayscale": self.grayscale_filter,
+            "Sketch": self.sketch_filter,
+            "Binary": self.binary_filter,
+        }
         self.snapshot_counter = 0
+        # JPEG encoding takes long enough to drop frames, so snapshots are
+        # saved in the background. A single thread keeps them in order
+        self.snapshot_pool = QThreadPool()
+        self.snapshot_pool.setMaxThreadCount(1)
         self.pause_video = False
+        # While paused, the processed frame is cached along with the settings
+        # it was processed with and the ROI outline drawn on it
+        self.paused_state = None
+        self.paused_frame = None
+        self.paused_outline = None
         
         # Create a video recorder instance
         self.recorder = VideoRecorder()
@@ -252,13 +882,26 @@ class VisionDesk(QMainWindow):
         self.fps_counter = FPSCounter()
         
         # Initialize face detection
+        self.face_detector = create_face_detector()
+        self.face_input_size = None
         self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
         self.detect_faces = False
         
-        # Set up timer for updating the camera feed
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_frame)
-        self.timer.start(30)  # Update every 30ms (~33 fps)
+        # Faces are detected on every Nth frame only, on a frame downscaled
+        # to face_detect_width, and the boxes from the last detection are
+        # drawn in between. Detection runs on its own thread so it never
+        # holds up the processed frames
+        self.face_detect_interval = 3
+        self.face_detect_width = 320
+        self.face_pool = QThreadPool()
+        self.face_pool.setMaxThreadCount(1)
+        self.detecting = False
+        self.face_frame_count = 0
+        self.last_faces = []
+        self.faces_region = None
+        # Counts changed detection results, so a paused frame is redrawn
+        # when boxes arrive after it was processed
+        self.face_results = 0
         
         # Load most recent frame
         self.current_frame = None
@@ -267,6 +910,12 @@ class VisionDesk(QMainWindow):
         self.status_timer = QTimer()
         self.status_timer.timeout.connect(self.clear_status)
         
+        # Coalesce slider-driven status messages until the value settles
+        self.pending_status = None
+        self.status_debounce = QTimer()
+        self.status_debounce.setSingleShot(True)
+        self.status_debounce.timeout.connect(self.flush_status)
+        
         # Position window in center of screen
         self.center_window()
     
@@ -579,6 +1228,18 @@ class VisionDesk(QMainWindow):
         threshold_layout.addLayout(preset_layout)
         threshold_group.setLayout(threshold_layout)
         canny_layout.addWidget(threshold_group)
+        
+        # Canny can run on a downscaled frame, 1/1 to 1/4 of the size
+        scale_layout = QHBoxLayout()
+        scale_layout.addWidget(QLabel("Processing Scale:"))
+        self.canny_scale_slider = QSlider(Qt.Horizontal)
+        self.canny_scale_slider.setRange(1, 4)
+        self.canny_scale_slider.setValue(1)
+        self.canny_scale_slider.valueChanged.connect(self.update_canny_scale)
+        self.canny_scale_label = QLabel("1/1")
+        scale_layout.addWidget(self.canny_scale_slider)
+        scale_layout.addWidget(self.canny_scale_label)
+        canny_layout.addLayout(scale_layout)
         canny_group.setLayout(canny_layout)
         
         filter_layout.addWidget(canny_group)
@@ -724,6 +1385,29 @@ class VisionDesk(QMainWindow):
         camera_group.setLayout(camera_layout)
         settings_layout.addWidget(camera_group)
         
+        # Processing settings
+        processing_group = QGroupBox("Processing")
+        processing_layout = QVBoxLayout()
+        
+        # OpenCL is only offered when OpenCV finds a usable device
+        self.opencl_checkbox = QCheckBox("Use OpenCL (GPU) for filters")
+        self.opencl_checkbox.setEnabled(cv2.ocl.haveOpenCL())
+        self.opencl_checkbox.setChecked(cv2.ocl.haveOpenCL())
+        self.opencl_checkbox.toggled.connect(self.toggle_opencl)
+        processing_layout.addWidget(self.opencl_checkbox)
+        
+        threads_layout = QHBoxLayout()
+        threads_layout.addWidget(QLabel("OpenCV Threads:"))
+        self.threads_spin = QSpinBox()
+        self.threads_spin.setRange(1, os.cpu_count() or 1)
+        self.threads_spin.setValue(self.cv_threads)
+        self.threads_spin.valueChanged.connect(self.change_cv_threads)
+        threads_layout.addWidget(self.threads_spin)
+        processing_layout.addLayout(threads_layout)
+        
+        processing_group.setLayout(processing_layout)
+        settings_layout.addWidget(processing_group)
+        
         # Output settings
         output_group = QGroupBox("Output Settings")
         output_layout = QVBoxLayout()
@@ -778,13 +1462,20 @@ class VisionDesk(QMainWindow):
         """Detect available cameras"""
         self.camera_selector.clear()
         
-        # Check for available cameras (usually 0-9 are enough for most systems)
+        # Probe the cameras in parallel, since each failed open can block
+        # for a second or more. DirectShow keeps its device list in state
+        # shared by all captures and rewrites it on every open, so there the
+        # probes run one at a time. Probes still running at the timeout are
+        # abandoned rather than holding up startup
+        candidates = camera_candidates()
         available_cameras = []
-        for i in range(10):
-            cap = cv2.VideoCapture(i)
-            if cap.isOpened():
-                available_cameras.append(i)
-                cap.release()
+        if candidates:
+            workers = 1 if camera_backend() == cv2.CAP_DSHOW else len(candidates)
+            executor = ThreadPoolExecutor(max_workers=workers)
+            futures = [executor.submit(probe_camera, i) for i in candidates]
+            done, _ = wait(futures, timeout=CAMERA_PROBE_TIMEOUT)
+            executor.shutdown(wait=False, cancel_futures=True)
+            available_cameras = [f.result() for f in futures if f in done and f.result() is not None]
         
         if available_cameras:
             for camera_idx in available_cameras:
@@ -792,16 +1483,51 @@ class VisionDesk(QMainWindow):
         else:
             self.camera_selector.addItem("No cameras found")
     
+    def start_capture(self):
+        """Start reading the camera on a capture thread"""
+        self.capture_thread = QThread()
+        self.capture_worker = CaptureWorker(self.camera, self.fps_slider.value())
+        self.capture_worker.moveToThread(self.capture_thread)
+        self.capture_thread.started.connect(self.capture_worker.run)
+        self.capture_worker.frame_ready.connect(self.update_frame)
+        self.capture_worker.capture_failed.connect(self.capture_failed)
+        self.capture_thread.start()
+    
+    def capture_failed(self):
+        """Report a failed camera read from the capture worker"""
+        self.show_status("Error: Failed to capture image")
+    
+    def stop_capture(self):
+        """Stop the capture thread so the camera can be changed or released"""
+        if self.capture_thread is None:
+            return
+        
+        self.capture_worker.stop()
+        self.capture_thread.quit()
+        self.capture_thread.wait()
+        self.capture_thread = None
+        self.capture_worker = None
+    
     def open_camera(self):
         """Open the selected camera"""
+        self.stop_capture()
         if self.camera is not None:
             self.camera.release()
         
-        self.camera = cv2.VideoCapture(self.camera_index)
+        self.camera = cv2.VideoCapture(self.camera_index, camera_backend())
+        if not self.camera.isOpened():
+            # Fall back to whatever backend OpenCV picks by default
+            self.camera = cv2.VideoCapture(self.camera_index)
         if not self.camera.isOpened():
             self.show_status("Error: Could not open camera.")
             return False
         
+        # Request MJPG before the resolution so the camera compresses and
+        # libjpeg-turbo decodes, instead of a software YUY2 to BGR pass
+        self.camera.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        # Keep only the newest frame queued in the driver
+        self.camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        
         # Try to set resolution if not default
         current_res = self.resolution_combo.currentText()
         if current_res != "Default":
@@ -812,6 +1538,7 @@ class VisionDesk(QMainWindow):
             except ValueError:
                 pass
         
+        self.start_capture()
         return True
     
     def change_camera(self, index):
@@ -832,27 +1559,34 @@ class VisionDesk(QMainWindow):
         
         try:
             width, height = map(int, resolution.split('x'))
-            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-            self.show_status(f"Resolution set to {resolution}")
         except ValueError:
             self.show_status("Invalid resolution format")
+            return
+        
+        # VideoCapture is not thread-safe, so pause capture while changing it
+        self.stop_capture()
+        self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.start_capture()
+        self.show_status(f"Resolution set to {resolution}")
     
     def change_fps_limit(self, value):
         """Change the FPS limit for the camera feed"""
         self.fps_value.setText(str(value))
         
-        # Update timer interval
+        # Update the rate the capture worker hands frames over at
         if value > 0:
-            interval = int(1000 / value)
-            self.timer.setInterval(interval)
-            self.show_status(f"FPS limit set to {value}")
+            if self.capture_worker is not None:
+                self.capture_worker.set_fps_limit(value)
+            self.queue_status(f"FPS limit set to {value}")
     
     def toggle_pause(self):
         """Toggle pause/resume of the video feed"""
         self.pause_video = not self.pause_video
         
         if self.pause_video:
+            self.paused_state = None
+            self.paused_frame = None
             self.pause_button.setText("Resume")
             self.pause_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay))
             self.show_status("Video paused")
@@ -873,10 +1607,27 @@ class VisionDesk(QMainWindow):
         """Toggle face detection"""
         self.detect_faces = checked
         if checked:
+            # Detect on the next frame rather than drawing stale boxes
+            self.face_frame_count = 0
+            self.last_faces = []
             self.show_status("Face detection enabled")
         else:
             self.show_status("Face detection disabled")
     
+    def toggle_opencl(self, checked):
+        """Toggle OpenCL acceleration of the filters"""
+        self.use_opencl = checked
+        if checked:
+            self.show_status("OpenCL filters enabled")
+        else:
+            self.show_status("OpenCL filters disabled")
+    
+    def change_cv_threads(self, value):
+        """Change the number of threads OpenCV uses for the filters"""
+        self.cv_threads = value
+        cv2.setNumThreads(value)
+        self.queue_status(f"OpenCV threads set to {value}")
+    
     def update_low_threshold(self, value):
         """Update low threshold for Canny edge detection"""
         self.low_threshold = value
@@ -887,11 +1638,16 @@ class VisionDesk(QMainWindow):
         self.high_threshold = value
         self.high_threshold_label.setText(str(value))
     
+    def update_canny_scale(self, value):
+        """Update the downscale factor for Canny edge detection"""
+        self.canny_scale = value
+        self.canny_scale_label.setText(f"1/{value}")
+    
     def apply_preset(self, low, high):
         """Apply preset values for Canny thresholds"""
         self.low_threshold_slider.setValue(low)
         self.high_threshold_slider.setValue(high)
-        self.show_status(f"Applied preset: {low}/{high}")
+        self.queue_status(f"Applied preset: {low}/{high}")
     
     def clear_roi(self):
         """Clear the current ROI selection"""
@@ -928,7 +1684,7 @@ class VisionDesk(QMainWindow):
     def change_filter(self, filter_name):
         """Change the current image filter"""
         self.current_filter = filter_name
-        self.show_status(f"Filter changed to {filter_name}")
+        self.queue_status(f"Filter changed to {filter_name}")
     
     def take_snapshot(self):
         """Take a snapshot of the current frame"""
@@ -943,11 +1699,20 @@ class VisionDesk(QMainWindow):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"snapshots/visiondesk_snap_{timestamp}.jpg"
         
-        # Save the snapshot
-        cv2.imwrite(filename, self.current_frame)
-        self.snapshot_counter += 1
-        
-        self.show_status(f"Snapshot saved: {filename}")
+        # Save the snapshot, flipped like the view. The flip is a new array,
+        # so the job does not share a buffer with the capture
+        job = SnapshotJob(filename, cv2.flip(self.current_frame, 1))
+        job.signals.finished.connect(self.snapshot_saved)
+        self.snapshot_pool.start(job)
+    
+    def snapshot_saved(self, result):
+        """Report a snapshot written by the snapshot thread"""
+        filename, ok = result
+        if ok:
+            self.snapshot_counter += 1
+            self.show_status(f"Snapshot saved: {filename}")
+        else:
+            self.show_status(f"Error: Could not save snapshot {filename}")
     
     def toggle_recording(self):
         """Toggle video recording on/off"""
@@ -958,21 +1723,25 @@ class VisionDesk(QMainWindow):
             self.record_button.setIcon(QIcon())  # Empty icon or a standard one like SP_DialogSaveButton
             self.rec_indicator.setVisible(False)
             self.rec_time.setVisible(False)
-            self.show_status(f"Recording saved: {filename}")
+            if self.recorder.error:
+                self.show_status(f"Error: Recording failed: {self.recorder.error}")
+            else:
+                self.show_status(f"Recording saved: {filename}")
         else:
             # Start recording
             if self.current_frame is None:
                 self.show_status("No frame available for recording")
                 return
                 
-            h, w = self.current_frame.shape[:2]
-            filename = self.recorder.start_recording((w, h))
+            filename = self.recorder.start_recording()
             if filename:
                 self.record_button.setText("Stop Recording")
                 self.record_button.setIcon(QIcon())
                 self.rec_indicator.setVisible(True)
                 self.rec_time.setVisible(True)
                 self.show_status(f"Recording started: {filename}")
+            else:
+                self.show_status(f"Error: Could not start recording: {self.recorder.error}")
     
     def update_recording_time(self):
         """Update the recording time display"""
@@ -999,6 +1768,17 @@ class VisionDesk(QMainWindow):
         self.statusBar.showMessage(message)
         self.status_timer.start(timeout)
     
+    def queue_status(self, message):
+        """Show a status message once rapid changes have settled"""
+        self.pending_status = message
+        self.status_debounce.start(50)
+    
+    def flush_status(self):
+        """Show the last queued status message"""
+        if self.pending_status is not None:
+            self.show_status(self.pending_status)
+            self.pending_status = None
+    
     def clear_status(self):
         """Clear the status bar message"""
         self.statusBar.clearMessage()
@@ -1016,24 +1796,36 @@ class VisionDesk(QMainWindow):
         if self.camera is None or not self.camera.isOpened():
             return
         
+        # Take the newest frame from the capture worker; this also lets it
+        # signal the next one
+        frame = self.capture_worker.latest_frame() if self.capture_worker else None
+        
+        # Nothing is shown while the window is minimized or hidden; keep
+        # recording, but skip processing and display
+        if self.isMinimized() or not self.isVisible():
+            if self.recorder.is_recording and not self.pause_video and frame is not None:
+                self.recorder.write_frame(frame)
+            return
+        
         # Skip frame update if paused
         if self.pause_video:
-            if self.current_frame is not None:
-                # Just redraw the current frame with any UI changes
-                processed_frame = self.process_frame(self.current_frame.copy())
-                self.display_frame(processed_frame)
+            # Reprocess the current frame only after a setting that affects
+            # it changed; a moved ROI outline is redrawn on the cached frame
+            state = self.paused_view_state()
+            roi = self.video_widget.roi_selector
+            outline = (roi.selecting, roi.selected, roi.top_left, roi.bottom_right)
+            if state != self.paused_state:
+                if self.current_frame is not None and not self.processing:
+                    self.paused_state = state
+                    self.start_processing(self.current_frame)
+            elif self.paused_frame is not None and outline != self.paused_outline:
+                self.paused_outline = outline
+                self.display_frame(roi.draw_roi(self.paused_frame.copy()))
             return
         
-        # Capture new frame
-        ret, frame = self.camera.read()
-        if not ret:
-            self.show_status("Error: Failed to capture image")
+        if frame is None:
             return
         
-        # Update FPS counter
-        fps = self.fps_counter.update()
-        self.fps_display.display(f"{fps:.1f}")
-        
         # Update recording time if recording
         self.update_recording_time()
         
@@ -1045,170 +1837,351 @@ class VisionDesk(QMainWindow):
         h, w = frame.shape[:2]
         self.resolution_label.setText(f"{w}x{h}")
         
-        # Flip the frame horizontally for a more natural view
-        frame = cv2.flip(frame, 1)
+        # Skip processing while the previous frame is still in flight; the
+        # capture worker keeps only the newest frame in the meantime
+        if self.processing:
+            return
+        
+        # Keep the captured frame as the original. It is never written to, as
+        # the recorder may still be encoding it; the processing thread flips
+        # it into a new array, which is the only full-frame copy per tick
+        self.current_frame = frame
+        
+        # Process it based on current settings on the worker thread
+        self.start_processing(frame)
+    
+    def start_processing(self, frame):
+        """Hand a frame to the processing thread"""
+        # The ROI tuple and the settings are passed as snapshots so the GUI
+        # can keep changing them meanwhile
+        roi = self.video_widget.roi_selector.get_roi()
+        self.processing = True
+        job = FrameJob(self.process_frame, frame, roi, self.processing_settings())
+        job.signals.finished.connect(self.show_processed_frame)
+        self.pool.start(job)
+    
+    def show_processed_frame(self, frame):
+        """Display a frame coming back from the processing thread"""
+        self.processing = False
         
-        # Store the original frame
-        self.current_frame = frame.copy()
+        # Update FPS counter
+        fps, updated = self.fps_counter.update()
+        if updated:
+            self.fps_display.display(f"{fps:.1f}")
         
-        # Process frame based on current settings
-        processed_frame = self.process_frame(frame)
+        # Keep the processed frame while paused, so ROI outline changes do
+        # not need another pass through the filters
+        roi = self.video_widget.roi_selector
+        if self.pause_video:
+            self.paused_frame = frame.copy()
+            self.paused_outline = (roi.selecting, roi.selected, roi.top_left, roi.bottom_right)
         
         # Draw ROI if it exists
-        processed_frame = self.video_widget.roi_selector.draw_roi(processed_frame)
+        frame = roi.draw_roi(frame)
         
         # Convert the frame to Qt format and display it
-        self.display_frame(processed_frame)
+        self.display_frame(frame)
+    
+    def processing_settings(self):
+        """Snapshot the settings a frame is processed with"""
+        blur_size = self.blur_slider.value()
+        if blur_size % 2 == 0:  # Ensure odd number for Gaussian blur
+            blur_size += 1
+        return ProcessingSettings(
+            self.current_filter, self.use_canny, self.low_threshold, self.high_threshold,
+            self.canny_scale, blur_size, self.use_opencl, self.detect_faces,
+            self.face_min_size.value(),
+            self.face_scale.value() / 10.0  # Convert 11-20 to 1.1-2.0
+        )
+    
+    def paused_view_state(self):
+        """Collect the settings that change how the paused frame is processed"""
+        return (self.processing_settings(), self.video_widget.roi_selector.get_roi(), self.face_results)
     
-    def process_frame(self, frame):
+    def process_frame(self, frame, roi, settings):
         """Process the frame based on current settings"""
         if frame is None:
             return None
-            
-        # Get ROI if available
-        roi = self.video_widget.roi_selector.get_roi()
-        processed = frame.copy()
         
-        # Apply filters
+        # OpenCV keeps the OpenCL switch per thread, so it is set on the
+        # thread that runs the filters
+        cv2.ocl.setUseOpenCL(settings.use_opencl)
+        
+        # Flip the captured frame horizontally for a more natural view. The
+        # flipped copy is owned by this job, so it is processed in place. Filters
+        # write into reused buffers, so their result is copied back into the
+        # frame, which the display keeps while the next frame is processed
+        frame = cv2.flip(frame, 1)
         if roi:
-            # Extract ROI
+            # Process a view of the ROI and write the result back into it
             x1, y1, x2, y2 = roi
-            roi_frame = frame[y1:y2, x1:x2].copy()
-            
-            # Apply processing to ROI
-            processed_roi = self.apply_processing(roi_frame)
-            
-            # Replace the ROI area in the original frame
-            processed[y1:y2, x1:x2] = processed_roi
+            roi_frame = frame[y1:y2, x1:x2]
+            processed_roi = self.apply_processing(roi_frame, settings, roi)
+            if processed_roi is not roi_frame:
+                roi_frame[:] = processed_roi
         else:
             # Apply processing to the entire frame
-            processed = self.apply_processing(frame)
+            processed = self.apply_processing(frame, settings)
+            if processed is not frame:
+                np.copyto(frame, processed)
         
-        return processed
+        return frame
     
-    def apply_processing(self, frame):
-        """Apply various processing options to the frame"""
-        # Apply selected filter
-        if self.current_filter != "None":
-            frame = self.apply_filter(frame, self.current_filter)
+    def apply_processing(self, frame, settings, roi=None):
+        """Apply various processing options to the frame, or the ROI cut from it"""
+        h, w = frame.shape[:2]
+        
+        # Run the filters through OpenCV's transparent API, which dispatches
+        # them to OpenCL on the GPU, and download the result once at the end
+        if settings.use_opencl and (settings.filter_name != "None" or settings.use_canny):
+            frame = cv2.UMat(frame)
+        
+        # Apply selected filter. With Canny enabled, filters with a grayscale
+        # result hand it straight to Canny instead of expanding it to BGR,
+        # only for Canny to convert it back
+        gray = None
+        gray_filter = self.gray_filters.get(settings.filter_name)
+        if settings.use_canny and gray_filter is not None:
+            gray = gray_filter(frame, settings)
+        elif settings.filter_name != "None":
+            frame = self.apply_filter(frame, settings)
         
         # Apply Canny edge detection if enabled
-        if self.use_canny:
-            # Convert frame to grayscale for Canny edge detection
-            if len(frame.shape) == 3:
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if settings.use_canny:
+            if gray is None:
+                edges = self.canny_edges(frame, (w, h), settings)
             else:
-                gray = frame
-                
-            edges = cv2.Canny(gray, self.low_threshold, self.high_threshold)
+                edges = self.canny_edges(gray, (w, h), settings, gray=True)
             
             # Convert edges back to BGR for display
-            frame = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
+            frame = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR,
+                                 dst=self.get_buffer('canny', edges, 3))
+        
+        if isinstance(frame, cv2.UMat):
+            frame = frame.get()
         
         # Apply face detection if enabled
-        if self.detect_faces:
-            frame = self.detect_faces_in_frame(frame)
+        if settings.detect_faces:
+            frame = self.detect_faces_in_frame(frame, settings, roi)
         
         return frame
     
-    def apply_filter(self, frame, filter_name):
+    def apply_filter(self, frame, settings):
         """Apply the selected filter to the frame"""
-        if filter_name == "Grayscale":
-            return cv2.cvtColor(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), cv2.COLOR_GRAY2BGR)
-        
-        elif filter_name == "Sepia":
-            # Sepia filter matrix
-            sepia_kernel = np.array([
-                [0.272, 0.534, 0.131],
-                [0.349, 0.686, 0.168],
-                [0.393, 0.769, 0.189]
-            ])
-            sepia_img = cv2.transform(frame, sepia_kernel)
-            return np.clip(sepia_img, 0, 255).astype(np.uint8)
-        
-        elif filter_name == "Blur":
-            blur_amount = self.blur_slider.value()
-            if blur_amount % 2 == 0:  # Ensure odd number for Gaussian blur
-                blur_amount += 1
-            return cv2.GaussianBlur(frame, (blur_amount, blur_amount), 0)
-        
-        elif filter_name == "Sharp":
-            kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-            return cv2.filter2D(frame, -1, kernel)
-        
-        elif filter_name == "Invert":
-            return cv2.bitwise_not(frame)
-        
-        elif filter_name == "Cartoon":
-            # Convert to grayscale
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            
-            # Apply median blur
-            gray = cv2.medianBlur(gray, 5)
-            
-            # Detect edges
-            edges = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, 
-                                         cv2.THRESH_BINARY, 9, 9)
-            
-            # Apply bilateral filter for cartoon effect
-            color = cv2.bilateralFilter(frame, 9, 300, 300)
+        gray_filter = self.gray_filters.get(settings.filter_name)
+        if gray_filter is not None:
+            gray = gray_filter(frame, settings)
+            return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR, dst=self.get_buffer('filter', frame))
+        
+        filter_func = self.filters.get(settings.filter_name)
+        if filter_func is None:
+            return frame
+        return filter_func(frame, settings)
+    
+    def sepia_filter(self, frame, settings):
+        """Apply the Sepia filter"""
+        # cv2.transform saturates uint8 output, so no clipping is needed
+        return cv2.transform(frame, self.sepia_kernel, dst=self.get_buffer('filter', frame))
+    
+    def blur_filter(self, frame, settings):
+        """Apply the Blur filter"""
+        # With Canny on, a frame blurred with CUDA is left on the GPU for it
+        return self.gaussian_blur(frame, settings.blur_size, download=not settings.use_canny)
+    
+    def sharp_filter(self, frame, settings):
+        """Apply the Sharp filter"""
+        return cv2.filter2D(frame, -1, self.sharp_kernel)
+    
+    def invert_filter(self, frame, settings):
+        """Apply the Invert filter"""
+        return cv2.bitwise_not(frame)
+    
+    def cartoon_filter(self, frame, settings):
+        """Apply the Cartoon filter"""
+        # Convert to grayscale
+        gray = self.to_gray(frame)
+        
+        # Apply median blur
+        smooth = cv2.medianBlur(gray, 5, dst=self.get_buffer('gray_blur', gray))
+        
+        # Detect edges
+        edges = cv2.adaptiveThreshold(smooth, 255, cv2.ADAPTIVE_THRESH_MEAN_C, 
+                                     cv2.THRESH_BINARY, 9, 9,
+                                     dst=self.get_buffer('edges', gray))
+        
+        # Apply bilateral filter for cartoon effect
+        color = self.get_buffer('color', frame)
+        if self.on_gpu(frame):
+            self.gpu_frame.upload(frame)
+            cv2.cuda.bilateralFilter(self.gpu_frame, 9, 300, 300).download(color)
+        else:
+            color = cv2.bilateralFilter(frame, 9, 300, 300, dst=color)
+        
+        # Combine edges with color image
+        cartoon = self.get_buffer('filter', frame)
+        if cartoon is not None:
+            cartoon[:] = 0
+        return cv2.bitwise_and(color, color, dst=cartoon, mask=edges)
+    
+    def emboss_filter(self, frame, settings):
+        """Apply the Emboss filter"""
+        return cv2.filter2D(frame, -1, self.emboss_kernel)
+    
+    def grayscale_filter(self, frame, settings):
+        """Apply the Grayscale filter, returning a single grayscale channel"""
+        return self.to_gray(frame)
+    
+    def sketch_filter(self, frame, settings):
+        """Apply the Sketch filter, returning a single grayscale channel"""
+        # Convert to grayscale
+        gray = self.to_gray(frame)
+        
+        # Invert grayscale image
+        inv_gray = cv2.bitwise_not(gray, dst=self.get_buffer('inv_gray', gray))
+        
+        # Apply Gaussian blur
+        blurred = self.gaussian_blur(inv_gray, settings.blur_size)
+        
+        if sketch_kernel is not None and isinstance(blurred, np.ndarray):
+            # Invert and divide in a single fused pass
+            sketch = inv_gray
+            sketch_kernel(gray, blurred, sketch)
+        else:
+            # Invert blurred image in place
+            inv_blurred = cv2.bitwise_not(blurred, dst=blurred)
             
-            # Combine edges with color image
-            cartoon = cv2.bitwise_and(color, color, mask=edges)
-            return cartoon
+            # Create pencil sketch
+            sketch = cv2.divide(gray, inv_blurred, scale=256.0, dst=inv_gray)
+        
+        return sketch
+    
+    def binary_filter(self, frame, settings):
+        """Apply the Binary filter, returning a single grayscale channel"""
+        gray = self.to_gray(frame)
+        _, binary = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY, dst=gray)
+        return binary
+    
+    def get_buffer(self, name, like, channels=None):
+        """Return a preallocated uint8 buffer shaped like a frame, reallocating it only when the shape changes"""
+        # OpenCL frames get their outputs from OpenCV's own UMat buffer pool
+        if isinstance(like, cv2.UMat):
+            return None
         
-        elif filter_name == "Sketch":
-            # Convert to grayscale
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if channels is None:
+            shape = like.shape
+        elif channels == 1:
+            shape = like.shape[:2]
+        else:
+            shape = like.shape[:2] + (channels,)
+        buffer = self.scratch.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, np.uint8)
+            self.scratch[name] = buffer
+        return buffer
+    
+    def to_gray(self, frame):
+        """Convert a BGR frame to grayscale in the shared gray buffer"""
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.get_buffer('gray', frame, 1))
+    
+    def on_gpu(self, frame):
+        """Check whether a frame is on the GPU already, or large enough to be filtered there"""
+        return self.use_cuda and (isinstance(frame, cv2.cuda_GpuMat) or (
+            isinstance(frame, np.ndarray) and frame.shape[0] * frame.shape[1] >= self.cuda_min_pixels))
+    
+    def canny_edges(self, frame, size, settings, gray=False):
+        """Run Canny edge detection on a BGR frame, or a grayscale one if gray is set, of the given (width, height)"""
+        if self.on_gpu(frame):
+            self.gpu_canny.setLowThreshold(settings.low_threshold)
+            self.gpu_canny.setHighThreshold(settings.high_threshold)
             
-            # Invert grayscale image
-            inv_gray = 255 - gray
+            gpu_gray = self.gpu_gray
+            if isinstance(frame, cv2.cuda_GpuMat):
+                # A blurred frame left on the GPU, in BGRA if it is in color
+                if frame.channels() == 1:
+                    gpu_gray = frame
+                else:
+                    cv2.cuda.cvtColor(frame, cv2.COLOR_BGRA2GRAY, gpu_gray)
+            elif not gray:
+                self.gpu_frame.upload(frame)
+                cv2.cuda.cvtColor(self.gpu_frame, cv2.COLOR_BGR2GRAY, gpu_gray)
+            else:
+                gpu_gray.upload(frame)
+            if settings.canny_scale == 1:
+                return self.gpu_canny.detect(gpu_gray).download()
             
-            # Apply Gaussian blur
-            blur_amount = self.blur_slider.value()
-            if blur_amount % 2 == 0:
-                blur_amount += 1
-            blurred = cv2.GaussianBlur(inv_gray, (blur_amount, blur_amount), 0)
+            # Downscale on the device as well, so only the small edge map is
+            # downloaded, then upsample it like below
+            w, h = size
+            small = cv2.cuda.resize(gpu_gray, (max(1, w // settings.canny_scale), max(1, h // settings.canny_scale)),
+                                    interpolation=cv2.INTER_AREA)
+            edges = self.gpu_canny.detect(small).download()
+            return cv2.resize(edges, size, interpolation=cv2.INTER_NEAREST)
+        
+        if not gray:
+            frame = self.to_gray(frame)
+        if settings.canny_scale == 1:
+            return cv2.Canny(frame, settings.low_threshold, settings.high_threshold,
+                             edges=self.get_buffer('canny_edges', frame))
+        
+        # Run Canny on a downscaled copy; the work drops with the square of
+        # canny_scale and the edges look the same at preview size
+        w, h = size
+        small = cv2.resize(frame, (max(1, w // settings.canny_scale), max(1, h // settings.canny_scale)),
+                           interpolation=cv2.INTER_AREA)
+        edges = cv2.Canny(small, settings.low_threshold, settings.high_threshold)
+        
+        # Upsample back to the frame size; nearest-neighbour keeps edges binary
+        return cv2.resize(edges, size, dst=self.get_buffer('canny_edges', frame),
+                          interpolation=cv2.INTER_NEAREST)
+    
+    def gaussian_blur(self, frame, ksize, download=True):
+        """Apply a Gaussian blur to a BGR or grayscale frame; without download, a GPU result is returned as a GpuMat"""
+        if self.on_gpu(frame):
+            color = len(frame.shape) == 3
             
-            # Invert blurred image
-            inv_blurred = 255 - blurred
+            # CUDA filters take 1 or 4 channels, so color frames go through BGRA
+            key = (color, ksize)
+            blur = self.gpu_blurs.get(key)
+            if blur is None:
+                mat_type = cv2.CV_8UC4 if color else cv2.CV_8UC1
+                blur = cv2.cuda.createGaussianFilter(mat_type, mat_type, (ksize, ksize), 0)
+                self.gpu_blurs[key] = blur
             
-            # Create pencil sketch
-            sketch = cv2.divide(gray, inv_blurred, scale=256.0)
+            if color:
+                self.gpu_frame.upload(frame)
+                cv2.cuda.cvtColor(self.gpu_frame, cv2.COLOR_BGR2BGRA, self.gpu_bgra)
+                blurred = blur.apply(self.gpu_bgra)
+                if not download:
+                    return blurred
+                return cv2.cuda.cvtColor(blurred, cv2.COLOR_BGRA2BGR).download()
             
-            # Convert back to BGR
-            return cv2.cvtColor(sketch, cv2.COLOR_GRAY2BGR)
-        
-        elif filter_name == "Emboss":
-            kernel = np.array([[-2,-1,0], [-1,1,1], [0,1,2]])
-            emboss = cv2.filter2D(frame, -1, kernel)
-            return emboss
+            self.gpu_gray.upload(frame)
+            blurred = blur.apply(self.gpu_gray)
+            return blurred.download() if download else blurred
         
-        elif filter_name == "Binary":
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            _, binary = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY)
-            return cv2.cvtColor(binary, cv2.COLOR_GRAY2BGR)
-        
-        return frame
+        return cv2.GaussianBlur(frame, (ksize, ksize), 0)
     
-    def detect_faces_in_frame(self, frame):
+    def detect_faces_in_frame(self, frame, settings, roi=None):
         """Detect faces in the frame"""
-        # Convert to grayscale
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Detect faces
-        min_size = self.face_min_size.value()
-        scale_factor = self.face_scale.value() / 10.0  # Convert 11-20 to 1.1-2.0
-        
-        faces = self.face_cascade.detectMultiScale(
-            gray,
-            scaleFactor=scale_factor,
-            minNeighbors=5,
-            minSize=(min_size, min_size)
-        )
+        # Boxes are relative to the region they were found in, so after the
+        # ROI changes they are not drawn and detection runs again right away
+        current = self.faces_region == roi
+        due = self.face_frame_count % self.face_detect_interval == 0 or not current
+        if due and not self.detecting:
+            # Downscale on this thread; the small copy is all the detection
+            # thread needs, so the frame itself can go on to be displayed
+            h, w = frame.shape[:2]
+            scale = max(1.0, w / self.face_detect_width)
+            small = cv2.resize(frame, (int(w / scale), int(h / scale)), interpolation=cv2.INTER_AREA)
+            
+            self.detecting = True
+            job = FaceJob(self.find_faces, small, scale, roi, settings)
+            job.signals.finished.connect(self.set_faces)
+            self.face_pool.start(job)
+        self.face_frame_count += 1
         
         # Draw rectangles around detected faces
-        for (x, y, w, h) in faces:
+        for (x, y, w, h) in (self.last_faces if current else []):
             cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
             
             # Draw label
@@ -1217,26 +2190,63 @@ class VisionDesk(QMainWindow):
         
         return frame
     
+    def find_faces(self, small, scale, settings):
+        """Detect faces in a downscaled frame, returning full resolution boxes"""
+        if self.face_detector is not None:
+            faces = self.detect_faces_yunet(small)
+        else:
+            faces = self.detect_faces_haar(small, scale, settings)
+        
+        # Scale the boxes back to full resolution and drop the small ones
+        min_size = settings.face_min_size
+        boxes = []
+        for (x, y, w, h) in faces:
+            x, y, w, h = (int(v * scale) for v in (x, y, w, h))
+            if w >= min_size and h >= min_size:
+                boxes.append((x, y, w, h))
+        return boxes
+    
+    def set_faces(self, result):
+        """Store the boxes from the detection thread for drawing"""
+        self.detecting = False
+        if self.detect_faces and result != (self.faces_region, self.last_faces):
+            self.faces_region, self.last_faces = result
+            self.face_results += 1
+    
+    def detect_faces_yunet(self, small):
+        """Detect faces with the YuNet DNN"""
+        # The network input size has to follow the frame size
+        input_size = (small.shape[1], small.shape[0])
+        if input_size != self.face_input_size:
+            self.face_detector.setInputSize(input_size)
+            self.face_input_size = input_size
+        
+        _, faces = self.face_detector.detect(small)
+        if faces is None:
+            return []
+        return faces[:, :4]
+    
+    def detect_faces_haar(self, small, scale, settings):
+        """Detect faces with the Haar cascade"""
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        
+        # Detect faces
+        min_size = max(1, int(settings.face_min_size / scale))
+        
+        return self.face_cascade.detectMultiScale(
+            gray,
+            scaleFactor=settings.face_scale_factor,
+            minNeighbors=5,
+            minSize=(min_size, min_size)
+        )
+    
     def display_frame(self, frame):
         """Convert and display frame in the GUI"""
         if frame is None:
             return
             
-        # Convert from BGR to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Convert to QImage
-        h, w, ch = rgb_frame.shape
-        bytesPerLine = ch * w
-        qImg = QImage(rgb_frame.data, w, h, bytesPerLine, QImage.Format_RGB888)
-        
-        # Scale the QImage to fit the video widget
-        scaled_pixmap = QPixmap.fromImage(qImg).scaled(
-            self.video_widget.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation
-        )
-        
-        # Display the image
-        self.video_widget.setPixmap(scaled_pixmap)
+        # Hand the BGR frame to the OpenGL widget, which scales it on the GPU
+        self.video_widget.set_frame(frame)
     
     def closeEvent(self, event):
         """Handle window close event"""
@@ -1244,6 +2254,10 @@ class VisionDesk(QMainWindow):
         if self.recorder.is_recording:
             self.recorder.stop_recording()
         
+        self.stop_capture()
+        self.pool.waitForDone()
+        self.face_pool.waitForDone()
+        self.snapshot_pool.waitForDone()
         if hasattr(self, 'camera') and self.camera is not None:
             self.camera.release()
             